@@ -36,6 +36,8 @@ class WrapperAppStack(core.Stack):
                 name='id',
                 type=dynamodb.AttributeType.STRING,
             ),
+            'billing_mode': dynamodb.BillingMode.PAY_PER_REQUEST,
+            'time_to_live_attribute': 'ttl',
         }
         return dynamodb.Table(self, "wrapperTable", **table_settings)
 
@@ -1,15 +1,14 @@
 """Main app file for wrapper app."""
 
-from datetime import datetime, timedelta
 import json
 import logging
 import os
 import re
-import uuid
+import secrets
+import time
+from typing import List, Tuple, Union
 
-import boto3
 from chalice import Chalice, Response
-import pydantic
 
 WRAPPER_APP_NAME = os.environ.get("WRAPPER_APP_NAME")
 WRAPPER_ENV = os.environ.get("WRAPPER_ENV")
@@ -17,66 +16,147 @@ WRAPPER_TABLE_NAME= os.environ.get("WRAPPER_TABLE_NAME")
 
 JSON_HEADERS = {'Content-Type': 'application/json'}
 
-_DYNAMO = None
+
+def create_dynamo_client():
+    """Build the dynamo client. boto3 is imported here so it is only loaded
+    when a client is actually needed."""
+    import boto3
+    from botocore.config import Config
+
+    return boto3.client(
+        "dynamodb",
+        config=Config(
+            max_pool_connections=50,
+            retries={'mode': 'adaptive', 'total_max_attempts': 3},
+            connect_timeout=3,
+            read_timeout=5,
+        ),
+    )
+
+
+# In Lambda the client is created during INIT so it (and its connection pool)
+# is reused across warm invocations. Elsewhere (tests, chalice local) it is
+# created on first use.
+DYNAMO = create_dynamo_client() if os.environ.get("AWS_EXECUTION_ENV") else None
+
+
+def get_dynamo_client():
+    """Returns dynamo client. This setup helps during tests."""
+    global DYNAMO
+    if DYNAMO is None:
+        DYNAMO = create_dynamo_client()
+    return DYNAMO
 
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 
-# TTL field validation
-class WrapperTtl(pydantic.BaseModel):
-    ttl: str
+_ID_RE = re.compile(r'[a-zA-Z0-9]+')
 
-    @pydantic.validator('ttl')
-    def validate_value(cls, v):
-        if int(v) < 30:
-            raise ValueError("must be greater than 30 seconds")
-        return v
+# Longest a wrapped value may be kept, one year
+MAX_TTL_SECONDS = 60 * 60 * 24 * 365
 
 
-# ID field validation
-class WrapperId(pydantic.BaseModel):
-    id: str
+class ValidationError(ValueError):
+    """A request field that failed validation."""
 
-    @pydantic.validator('id')
-    def validate_id(cls, v):
-        if re.search('[^a-zA-Z0-9]+', v):
-            raise ValueError('id contains invalid characters')
-        return v
+    def __init__(self, field: str, msg: str, type_: str = 'value_error'):
+        super().__init__(f"{field}: {msg}")
+        self.field = field
+        self.msg = msg
+        self.type = type_
 
 
-# Validation for incoming Value field + TTL
-class WrapperIn(WrapperTtl):
-    value: str
+class RequestValidationError(ValueError):
+    """Every field of a request body that failed validation."""
+
+    def __init__(self, errors: List[ValidationError]):
+        super().__init__(errors)
+        self.errors = errors
 
 
-# Validation for Outgoing ID + expire
-class WrapperPostOut(WrapperId):
-    expire: int
+# TTL field validation
+def validate_ttl(v: Union[int, str]) -> int:
+    """Return ttl as an int, raising ValidationError if it is under 30
+    seconds or over MAX_TTL_SECONDS."""
+    # int() would truncate floats and accept bools (an int subclass), so
+    # reject both rather than silently changing the ttl.
+    if isinstance(v, (bool, float)):
+        raise ValidationError(
+            'ttl', "value is not a valid integer", 'type_error.integer'
+        )
+    try:
+        ttl = int(v)
+    except (TypeError, ValueError, OverflowError):
+        raise ValidationError(
+            'ttl', "value is not a valid integer", 'type_error.integer'
+        )
+    if ttl < 30:
+        raise ValidationError('ttl', "must be greater than 30 seconds")
+    if ttl > MAX_TTL_SECONDS:
+        raise ValidationError(
+            'ttl', f"must be less than {MAX_TTL_SECONDS} seconds"
+        )
+    return ttl
+
+
+# ID field validation
+def validate_id(v: str) -> str:
+    """Return id unchanged, raising ValidationError if it has invalid
+    characters."""
+    if not isinstance(v, str) or not _ID_RE.fullmatch(v):
+        raise ValidationError('id', "id contains invalid characters")
+    return v
 
 
-# Validation for outgoing response with value from GET request
-class WrapperGetOut(WrapperPostOut):
-    value: str
+# Validation for incoming Value field + TTL
+def validate_wrapper_in(body) -> Tuple[int, str]:
+    """Validate incoming json body and return its (ttl, value), raising
+    RequestValidationError listing every field that failed."""
+    if not isinstance(body, dict):
+        raise RequestValidationError([
+            ValidationError('__root__', "value is not a valid dict", 'type_error.dict'),
+        ])
+
+    errors = []
+    ttl = None
+    if 'ttl' not in body:
+        errors.append(ValidationError('ttl', "field required", 'value_error.missing'))
+    else:
+        try:
+            ttl = validate_ttl(body['ttl'])
+        except ValidationError as e:
+            errors.append(e)
 
+    value = body.get('value')
+    if 'value' not in body:
+        errors.append(ValidationError('value', "field required", 'value_error.missing'))
+    elif not isinstance(value, str):
+        errors.append(ValidationError('value', "str type expected", 'type_error.str'))
 
-def get_dynamo_client():
-    """Returns dynamo client. This setup helps during tests."""
-    global _DYNAMO
-    if _DYNAMO is None:
-        _DYNAMO = boto3.client("dynamodb")
-    return _DYNAMO
+    if errors:
+        raise RequestValidationError(errors)
+    return ttl, value
+
+
+def validation_jsonify(errors: List[ValidationError]) -> list:
+    """Format validation errors as a list of loc/msg/type dicts."""
+    return [{'loc': [e.field], 'msg': e.msg, 'type': e.type} for e in errors]
 
 
 def random_id() -> str:
     """Generate unique id for tracking or sending back to user."""
-    _uuid = str(uuid.uuid4()).replace("-", "")
-    return f"{_uuid}"
+    return secrets.token_hex(16)
 
 
-def validation_jsonify(v: pydantic.ValidationError) -> dict:
-    return json.loads(v.json())
+def json_response(body: dict) -> Response:
+    """Serialize body up front so encoding errors surface in the handler."""
+    return Response(
+        body=json.dumps(body, separators=(',', ':')),
+        status_code=200,
+        headers=JSON_HEADERS,
+    )
 
 
 app = Chalice(app_name=f"{WRAPPER_APP_NAME}-{WRAPPER_ENV}", debug=True)
@@ -91,81 +171,54 @@ def v1_wrapper_post():
     request_id = request.lambda_context.aws_request_id
 
     try:
+        json_body = request.json_body
+
         # Incoming json body validation
         try:
             logging.info('validating incoming json')
-            WrapperIn(**request.json_body)
-        except pydantic.ValidationError as e:
-            logger.error(e.json())
+            ttl_seconds, value = validate_wrapper_in(json_body)
+        except RequestValidationError as e:
             body = {
                 'status': 'failed',
-                'error': validation_jsonify(e),
+                'error': validation_jsonify(e.errors),
                 'ref': request_id,
             }
-            logger.error(f"{body}")
-            return Response(
-                body={**body, 'ref': request_id},
-                status_code=200,
-                headers=JSON_HEADERS,
-            )
+            logger.error("%s", body)
+            return json_response(body)
 
         # This is the ID that will be saved as the 'key' in dynamodb
         # and will be passed back to the customer.
         wrap_id = random_id()
 
-        dynamo = get_dynamo_client()
-        _expire_datetime = datetime.utcnow() + timedelta(seconds=request.json_body['ttl'])
-        expire = _expire_datetime.strftime('%s')
+        # Epoch seconds, the format DynamoDB expects for the ttl attribute
+        expire = str(int(time.time()) + ttl_seconds)
 
-        # Create response and perform validations
-        try:
-            logging.info('trying to create and validate response')
-            wrapper_out = WrapperPostOut(
-                id=wrap_id,
-                expire=expire,
-            )
-        except pydantic.ValidationError as e:
-            logger.error(f"internal error, {e.__class__}, {e}")
-            return Response(
-                body={
-                    'status': 'failed',
-                    'error': "internal error",
-                    'ref': request_id,
-                },
-                status_code=200,
-                headers=JSON_HEADERS,
-            )
-
-        _ = dynamo.put_item(
+        # Build the response before the write so nothing is stored that the
+        # client could not be given an id for.
+        response = json_response({
+            'status': 'success',
+            'data': {'id': wrap_id, 'expire': int(expire)},
+            'ref': request_id,
+        })
+
+        _ = get_dynamo_client().put_item(
             TableName=WRAPPER_TABLE_NAME,
             Item={
                 'id': {'S': wrap_id},
-                'value': {'S': request.json_body['value']},
+                'value': {'S': value},
                 'ttl': {'N': expire},
             },
         )
 
-        logger.info(f"{request_id} successful")
-        return Response(
-            body={
-                'status': 'success',
-                'data': json.loads(wrapper_out.json()),
-                'ref': request_id,
-            },
-            status_code=200,
-            headers=JSON_HEADERS,
-        )
+        logger.info("%s successful", request_id)
+        return response
     except Exception as e:
-        logger.error(f"internal error: {e.__class__}, {e}")
-        return Response(
-            body={
-                'status': 'failed',
-                'error': 'internal error',
-                'ref': request_id,
-            },
-            status_code=200,
-            headers=JSON_HEADERS,
-        )
+        logger.error("internal error: %s, %s", e.__class__, e)
+        return json_response({
+            'status': 'failed',
+            'error': 'internal error',
+            'ref': request_id,
+        })
 
 
 @app.route("/v1/wrapper/{wrap_id}", methods=["GET"])
@@ -176,75 +229,52 @@ def v1_wrapper_get(wrap_id):
 
     try:
         try:
-            WrapperId(id=wrap_id)
-        except pydantic.ValidationError as e:
-            logger.error(validation_jsonify(e))
-            return Response(
-                body={
-                    'status': 'failed',
-                    'error': validation_jsonify(e),
-                    'ref': request_id,
-                },
-                status_code=200,
-                headers=JSON_HEADERS,
-            )
-
-        dynamo = get_dynamo_client()
-        response = dynamo.delete_item(
+            validate_id(wrap_id)
+        except ValidationError as e:
+            error = validation_jsonify([e])
+            logger.error("%s", error)
+            return json_response({
+                'status': 'failed',
+                'error': error,
+                'ref': request_id,
+            })
+
+        response = get_dynamo_client().delete_item(
             TableName=WRAPPER_TABLE_NAME,
             Key={'id': {'S': wrap_id}},
             ReturnValues='ALL_OLD'
         )
 
-        # Wrapper id likely not found
-        if 'Attributes' not in response:
-            logger.info(f"wrapper id not found or expired: {wrap_id}")
-            return Response(
-                body={
-                    'status': 'failed',
-                    'error': 'wrapper id not found or expired',
-                    'ref': request_id,
-                },
-                status_code=200,
-                headers=JSON_HEADERS,
-            )
-
-        # Perform validations for json going back to the client
-        try:
-            logging.info('creating and validating response for client')
-            return_data = WrapperGetOut(
-                id=response['Attributes']['id']['S'],
-                value=response['Attributes']['value']['S'],
-                expire=response['Attributes']['ttl']['N'],
-            )
-        except pydantic.ValidationError as e:
-            logger.error(validation_jsonify(e))
-            return Response(
-                body={
-                    'status': 'failed',
-                    'error': validation_jsonify(e),
-                    'ref': request_id,
-                },
-                status_code=200,
-                headers=JSON_HEADERS,
-            )
-
-        logger.info(f"successful")
-        return Response(
-            body={
-                'status': 'success',
-                'data': json.loads(return_data.json()),
-                'ref': request_id,
-            },
-            status_code=200,
-            headers=JSON_HEADERS,
-        )
-    except Exception as e:
-        logger.error(f"internal error: {e.__class__}, {e}")
-        return Response(
-            body={
+        attributes = response.get('Attributes')
+        expire = int(attributes['ttl']['N']) if attributes else None
+
+        # Wrapper id likely not found. DynamoDB TTL removes expired items
+        # lazily (up to ~48 hours late), so a returned item may be expired.
+        if attributes is None or expire <= time.time():
+            logger.info("wrapper id not found or expired: %s", wrap_id)
+            return json_response({
                 'status': 'failed',
-                'error': 'internal error',
+                'error': 'wrapper id not found or expired',
                 'ref': request_id,
-            }
-        )
+            })
+
+        # Item was written by the POST handler, no need to re-validate.
+        return_data = {
+            'id': attributes['id']['S'],
+            'value': attributes['value']['S'],
+            'expire': expire,
+        }
+
+        logger.info("successful")
+        return json_response({
+            'status': 'success',
+            'data': return_data,
+            'ref': request_id,
+        })
+    except Exception as e:
+        logger.error("internal error: %s, %s", e.__class__, e)
+        return json_response({
+            'status': 'failed',
+            'error': 'internal error',
+            'ref': request_id,
+        })